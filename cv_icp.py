@@ -36,21 +36,46 @@ dt_pots = 120.     # Time intrevals used for the time correction
 correct_time_manually = False # Assume the following values
 manual_slope = 0.5
 manual_zero = 10.
+tune_time_manually = False # Tune the manual values with sliders, starting from the above
 
 tini = dt_pots   # Start time to consider the CV data in plots
 
 icols_icp = [icol_icp,2] # Columns with ICP steps to be plot (e.g. [1,2])
+
+# Other instruments, each with its own clock, to be aligned with the
+# potentiostat as the ICP above. Keys as in src/alignment.instrument, e.g.:
+# other_instruments = [dict(name='icp2',data_file='05_Zn_CV.csv',
+#                           steps_file='02_Zn_Steps.csv',columns=[1,2],
+#                           step_col=1,time_unit=60.,delimiter=','),
+#                      dict(name='flow',data_file='flow.txt',
+#                           steps_file='flow_steps.txt',columns=[1],
+#                           step_col=1,unit='mL min-1')]
+other_instruments = []
+
+resample = False # True to resample all signals onto a uniform time grid
+dt_resample = 1. # Time step (s) of the uniform grid
+average_resample = True # Average the samples within each step of the grid
+
+quantify_dissolution = True # Charge and integrated ICP per CV cycle
+
+compact_output = False # True to store signals in single precision (time kept double)
+
+io_threads = 4 # Threads to read and write files in the background
+makeplots = True  # False = no plots are made (faster for batch runs)
 showplots = True  # True = plots are shown while program runs
 plotformat = 'png' # or 'pdf'  or 'jpg'
 #####################################End of modifications
 
 import numpy as np
 import os.path
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 from src.indexes import get_icp_subsets
-from src.plotting import show_pots_icp
+from src.resample import uniform_grid, interp_columns, resample_columns
+from src.dissolution import write_dissolution
+from src.plotting import get_pyplot, show_pots_icp
 from src.io import *
 from src.icp_t_correction import *
+from src.alignment import *
 
 # Check if multiple CV files are expected
 if (multipleCVfiles):
@@ -62,18 +87,54 @@ Dt = get_Dt(files)
 prefixes= ['preocv','cv','postocv','icp']
 infiles = ['inputdata/'+ifile for ifile in files]
 
-# Get ICP/intensity header
-icp_colnoms = get_col_nom(infiles[3],icols_icp,delimiter=',')
-icp_head = ", ".join(icp_colnoms)
+# The ICP and any other instruments to be aligned with the potentiostat
+instruments = [instrument('icp',icp_file,steps_icp,icols_icp,icol_icp,
+                          time_unit=60.,delimiter=',',
+                          height_fraction=height_fraction)]
+instruments += [instrument(**inst) for inst in other_instruments]
 
 # Check that those files exist in the inputdata folder
 check_files(infiles)
+check_files(['inputdata/'+inst[ff] for inst in instruments[1:]
+             for ff in ['data_file','steps_file']])
+
+# Get ICP/intensity header, naming the columns of the other instruments
+# (only the ICP columns are plotted and used for the dissolution)
+icp_colnoms = instrument_colnoms(instruments[0])
+all_colnoms = list(icp_colnoms)
+for inst in instruments[1:]:
+    all_colnoms += [inst['name']+'_'+nom for nom in instrument_colnoms(inst)]
+icp_head = ", ".join(all_colnoms)
+icp_units = ", ".join(sum([[inst['unit']]*len(inst['columns'])
+                           for inst in instruments],[]))
 
-# Read the ICP time in seconds
-t_icp = 60*read_columns(infiles[3],[0],delimiter=',')
+# Read all the input files in the background, with the times in
+# double precision and the signals in the precision of the output:
+# V for the (O)CV files (plus I and cycle number for the CV)
+# and the measured columns for each instrument.
+# Cycle numbers are exact in single precision.
+pool = ThreadPoolExecutor(max_workers=io_threads)
+sdtype = np.float32 if compact_output else float
+cols = [[1],[1,3,5] if multipleCVfiles else [1,3],[1]]
+reads_t = [prefetch_columns(pool,infiles[i],0) for i in range(3)]
+reads = [prefetch_columns(pool,infiles[i],cols[i],dtype=sdtype)
+         for i in range(3)]
+read_inst = [prefetch_instrument(pool,inst,dtype=sdtype)
+             for inst in instruments]
+pending = []
 
 # Correct the ICP time
-if correct_time_manually:
+if correct_time_manually and tune_time_manually:
+    if not (makeplots and showplots):
+        print('STOP: tune_time_manually requires makeplots=True and showplots=True') ; exit()
+    slope, zero = icp_t_tuner(steps_icp,steps_pots,
+                              stepcol_pots,icol_icp,
+                              tstart_pots,dt_pots,
+                              height_fraction,
+                              slope=manual_slope,
+                              zero=manual_zero,
+                              plot_format=plotformat)
+elif correct_time_manually:
     slope, zero = icp_t_manual(steps_icp,steps_pots,
                                stepcol_pots,icol_icp,
                                tstart_pots,dt_pots,
@@ -81,100 +142,172 @@ if correct_time_manually:
                                slope=manual_slope,
                                zero=manual_zero,
                                show_plots=showplots,
-                               plot_format=plotformat)
+                               plot_format=plotformat,
+                               make_plots=makeplots)
+
+# Correct the time of all the (other) instruments at once
+if correct_time_manually:
+    slopes, zeros = align_clocks(instruments[1:],steps_pots,stepcol_pots,
+                                 tstart_pots,dt_pots,
+                                 show_plots=showplots,
+                                 plot_format=plotformat,
+                                 make_plots=makeplots)
+    slopes = np.append(slope,slopes) ; zeros = np.append(zero,zeros)
 else:
-    slope, zero = icp_t_correction(steps_icp,steps_pots,
-                                   stepcol_pots,icol_icp,
-                                   tstart_pots,dt_pots,
-                                   height_fraction,
-                                   show_plots=showplots,
-                                   plot_format=plotformat)
-t_icp = (t_icp - zero)/slope
+    slopes, zeros = align_clocks(instruments,steps_pots,stepcol_pots,
+                                 tstart_pots,dt_pots,
+                                 show_plots=showplots,
+                                 plot_format=plotformat,
+                                 make_plots=makeplots)
 
-# Read the ICP data
-icp = read_columns(infiles[3],icols_icp,delimiter=',')
+# Get the instrument data, with the time in seconds corrected
+t_inst = [] ; inst_values = []
+for jj,inst in enumerate(instruments):
+    read_t, read_values = read_inst[jj]
+    t_inst.append(correct_times(read_t.result(),inst,slopes[jj],zeros[jj]))
+    inst_values.append(read_values.result())
+    read_inst[jj] = None
+
+# Names of the instrument columns in the output tables
+inst_names = [] ; icp_names = []
+for jj,inst in enumerate(instruments):
+    inst_names.append(['icp'+str(len(icp_names)+ii)
+                       for ii in range(len(inst['columns']))])
+    icp_names += inst_names[jj]
 
 # Loop over the (O)CV files
 for i in range(len(files)-1):
 
+    # Get the data read in the background
+    times = reads_t[i].result()
+    data = np.atleast_2d(reads[i].result())
+    reads_t[i] = None ; reads[i] = None
+
     if (i==0 or i ==2): 
-        # Read the Pre and Post-ocv files
-        times = read_columns(infiles[i],0)
-        voltage = read_columns(infiles[i],1)
+        # Pre and Post-ocv files: time, V
         prop_label='V(V)'
+        names = ['time','E'] + icp_names
+        pots_names = ['E']
         
     elif (i==1):
-        # Read the CV files, ignoring data for t<tini
-        times = read_columns(infiles[i],0)
-        voltage = read_columns(infiles[i],1)
-        cellV = read_columns(infiles[i],2)
-        current = read_columns(infiles[i],3)
+        # CV files: time, V, I (and cycle number)
         prop_label='I(A)'
+        names = ['time','E','I'] + icp_names + ['j']
+        pots_names = ['E','I']
        
     # Check the stepping size
     diff_t = np.unique(np.diff(times))
     if (len(diff_t) > 1):
         if (max(np.diff(diff_t)) > 5e-4):
             print('\n WARNING: there are different step sizes within {} ({}): {} \n'.format(prefixes[i],files[i],diff_t))
+            if (not resample):
+                print('  Set resample=True to use a uniform time grid \n')
         
     # Find the time of the last measurement
     print('  time({})+Dt: {:.3f} s to {:.3f} s'.format(prefixes[i],times[0]+Dt[i],times[-1]+Dt[i]))
 
-    t_icp_subset, icp_subset = get_icp_subsets(prefixes[i],
-                                               times[0],times[-1],Dt[i],
-                                               t_icp,icp,len(icols_icp))
+    # Subsets of each instrument around the phase
+    subsets = []
+    for jj,inst in enumerate(instruments):
+        t_subset, subset = get_icp_subsets(prefixes[i],
+                                           times[0],times[-1],Dt[i],
+                                           t_inst[jj],inst_values[jj],
+                                           len(inst['columns']))
+        subsets.append((t_subset,subset))
 
-    print('  times(ICP subset): {:.3f} s to {:.3f} s'.format(t_icp_subset[0],t_icp_subset[-1]))
+        print('  times({} subset): {:.3f} s to {:.3f} s'.format(inst['name'].upper(),t_subset[0],t_subset[-1]))
 
-    # Define the arrays to plot and store
-    x_pots = times+Dt[i]
+    # Shift the times, in place
+    times += Dt[i]
 
-    if(i == 1):
-        y_pots = current
-        vv = voltage
+    # Preallocate the output table, with views of its columns
+    if resample:
+        grid = uniform_grid(times[0],times[-1],dt_resample)
+        nrows = len(grid)
     else:
-        y_pots = voltage
+        nrows = len(times)
+    tofile = np.empty(nrows,dtype=output_dtype(names,compact=compact_output))
+    x_pots = tofile['time']
+    v_pots = column_view(tofile,pots_names)
+    y_inst = [column_view(tofile,nn) for nn in inst_names]
+    y_icp = y_inst[0]
 
-        
-    # Get different ICPs
-    if (len(icols_icp) == 1):
-        y_icp = np.interp(x_pots,t_icp_subset,icp_subset)
-        print(prefixes[i],y_icp,t_icp_subset,icp_subset,'+++')
+    if resample:
+        # Resample all the potentiostat signals onto a uniform grid
+        x_pots[:] = grid
+        resample_columns(x_pots,times,data[:len(pots_names)],
+                         average=average_resample,out=v_pots)
+        print('  Resampled onto {} times with dt={} s'.format(nrows,dt_resample))
+
+        # Get all the columns of each instrument at once
+        for jj,(t_subset,subset) in enumerate(subsets):
+            resample_columns(x_pots,t_subset,subset,
+                             average=average_resample,out=y_inst[jj])
+    else:
+        x_pots[:] = times
+        v_pots[:] = data[:len(pots_names)]
+
+        # Get all the columns of each instrument at once
+        for jj,(t_subset,subset) in enumerate(subsets):
+            interp_columns(x_pots,t_subset,subset,out=y_inst[jj])
+
+    if (i == 1):
+        # Cycle numbers, produced by joinCVfiles
+        if (multipleCVfiles):
+            # Cycle of the last sample before each output time
+            ind = np.clip(np.searchsorted(times,x_pots,side='right') - 1,
+                          0,len(times)-1)
+            cycle = data[2,ind].astype(int)
+
+            # No cycle for (resampled) times within the gaps between cycles
+            inext = np.minimum(ind+1,len(times)-1)
+            cycle[(data[2,inext] != data[2,ind]) & (x_pots > times[ind])] = 0
+        else:
+            cycle = np.ones(nrows,dtype=int)
+
+        # Current density
+        np.divide(tofile['I'],area,out=tofile['j'])
+        y_pots = tofile['I']
     else:
-        isub = -1
-        for sub in icp_subset:
-            y = np.interp(x_pots,t_icp_subset,sub)
-            isub += 1
-            if (isub == 0):
-                y_icp = y
-            else:
-                y_icp = np.column_stack((y_icp,y))
+        y_pots = tofile['E']
+    del data, times, subsets
 
     # Plot POTS and ICP
-    show_pots_icp(x_pots,y_pots,y_icp,tini,prop_label,
-                  prefixes[i],plot_format=plotformat,
-                  icplabels=icp_colnoms)
+    if makeplots:
+        show_pots_icp(x_pots,y_pots,y_icp.T,tini,prop_label,
+                      prefixes[i],plot_format=plotformat,
+                      icplabels=icp_colnoms)
 
     # Write output
     header1 = '# '+prefixes[i]+'\n' 
-    tofile = np.array([])
     if (i==1):
         header2 = '# time, E, I, '+icp_head+', j \n'
-        header3 = '# s, V, mA, counts, mA cm-2 \n'
-        y_pots_area = y_pots/area
-        tofile = np.column_stack((x_pots,vv,y_pots,y_icp,y_pots_area))
+        header3 = '# s, V, mA, '+icp_units+', mA cm-2 \n'
     else:
         header2 = '# time, E, '+icp_head+' \n'
-        header3 = '# s, V, counts \n'
-        tofile = np.column_stack((x_pots,y_pots,y_icp))
+        header3 = '# s, V, '+icp_units+' \n'
 
+    # Write the output in the background,
+    # while the next phase is processed
     outfil = 'output/'+files[i]
-    with open(outfil, 'w') as outf:
-        outf.write(header1)
-        outf.write(header2)
-        outf.write(header3)
-        np.savetxt(outf,tofile,fmt='%1.8e',delimiter=',')
-    outf.closed
-    print('Output file: {}'.format(outfil))
+    pending.append((outfil,pool.submit(write_output,outfil,
+                                       header1+header2+header3,tofile)))
+
+    # Report the outputs already written, in order
+    while (pending and pending[0][1].done()):
+        outfil, job = pending.pop(0)
+        job.result()
+        print('Output file: {}'.format(outfil))
+
+    if (i==1 and quantify_dissolution):
+        # Charge and integrated ICP per cycle
+        write_dissolution('output/dissolution_'+files[i],
+                          x_pots,y_pots,y_icp,cycle,icp_colnoms)
 
-    if (showplots): plt.show()
+    if (showplots and makeplots): get_pyplot().show()
+
+# Wait for all the outputs, raising any errors
+for outfil, job in pending:
+    job.result()
+    print('Output file: {}'.format(outfil))
+pool.shutdown()
@@ -0,0 +1,143 @@
+"""
+.. moduleauthor:: Violeta Gonzalez-Perez <violetagp@protonmail.com>
+"""
+import numpy as np
+from .io import get_col_nom, prefetch_columns
+from .icp_t_correction import instrument, get_instrument_steps, read_pots_steps
+from .plotting import get_pyplot, show_corrected_steps
+
+def instrument_colnoms(inst):
+    '''
+    Get the names of the measured columns of an instrument
+
+    Args:
+    inst: dictionary, instrument as given by instrument()
+
+    Return:
+    colnoms: list of strings, names of the columns
+    '''
+    colnoms = get_col_nom('inputdata/'+inst['data_file'],inst['columns'],
+                          delimiter=inst['delimiter'])
+
+    return colnoms
+
+def prefetch_instrument(pool,inst,dtype=float):
+    '''
+    Start reading the times (in double precision) and
+    the measurements of an instrument in the background
+
+    Args:
+    pool: concurrent.futures.Executor, pool of threads
+    inst: dictionary, instrument as given by instrument()
+    dtype: data type of the measurements
+
+    Return:
+    read_t: concurrent.futures.Future, with the times
+    read_values: concurrent.futures.Future, with the measured columns
+    '''
+    infile = 'inputdata/'+inst['data_file']
+    read_t = prefetch_columns(pool,infile,inst['time_col'],
+                              delimiter=inst['delimiter'])
+    read_values = prefetch_columns(pool,infile,inst['columns'],
+                                   delimiter=inst['delimiter'],dtype=dtype)
+
+    return read_t, read_values
+
+def fit_drifts(gt_pots,gt_inst):
+    '''
+    Fit at once straight lines to the start of the steps of all
+    the instruments: t_inst = slope*t_pots + zero
+
+    Args:
+    gt_pots: list of np.arrays of floats, start of the Pots. steps
+    gt_inst: list of np.arrays of floats, start of the instrument steps
+
+    Return:
+    slopes: np.array of floats, the slope of the best fit per instrument
+    zeros: np.array of floats, the shift of the best fit per instrument
+    '''
+    # Pad the steps into arrays with weights 0 for the padding
+    nn = np.array([len(gg) for gg in gt_pots])
+    if (min(nn) < 2):
+        print('STOP (src/alignment) \n less than 2 step starts found for some instruments: {}'.format(nn))
+        exit()
+    ww = (np.arange(max(nn))[None,:] < nn[:,None]).astype(float)
+    xx = np.zeros(ww.shape) ; yy = np.zeros(ww.shape)
+    xx[ww > 0.] = np.concatenate(gt_pots)
+    yy[ww > 0.] = np.concatenate(gt_inst)
+
+    # Least squares, centering the times for accuracy
+    xmean = np.sum(ww*xx,axis=1)/nn
+    ymean = np.sum(ww*yy,axis=1)/nn
+    dx = ww*(xx - xmean[:,None])
+    dy = ww*(yy - ymean[:,None])
+    slopes = np.sum(dx*dy,axis=1)/np.sum(dx*dx,axis=1)
+    zeros = ymean - slopes*xmean
+
+    return slopes,zeros
+
+def align_clocks(instruments,steps_pots,stepcol_pots,tstart_pots,dt_pots,show_plots=True,plot_format='pdf',make_plots=True):
+    '''
+    Correct the time drift of any number of instruments with respect
+    to the potentiostat, fitting all of them at once to straight lines:
+    t_inst = slope*t_pots + zero
+
+    Args:
+    instruments: list of dictionaries, as given by instrument()
+    steps_pots: characters, the name of the Potentiostat steps file
+    stepcol_pots: integer, column with current steps
+    tstart_pots: float, start time for Pots. Steps
+    dt_pots: float, interval for Pots. Steps
+    show_plots: boolean, to show or not the time correction plots
+    plot_format: characters, format for plots
+    make_plots: boolean, False to not make any plots
+
+    Return:
+    slopes: np.array of floats, the slope of the best fit per instrument
+    zeros: np.array of floats, the shift of the best fit per instrument
+    '''
+    if (len(instruments) == 0):
+        return np.array([]),np.array([])
+
+    # Read the pots calibration, only once
+    ts_pots, i_pots = read_pots_steps(steps_pots,stepcol_pots)
+
+    steps = [get_instrument_steps(inst,ts_pots,i_pots,tstart_pots,dt_pots,
+                                  plot_format=plot_format,
+                                  make_plots=make_plots)
+             for inst in instruments]
+
+    slopes, zeros = fit_drifts([st[2] for st in steps],
+                               [st[3] for st in steps])
+
+    if not make_plots:
+        return slopes,zeros
+
+    # Plot the corrected steps
+    for ii,inst in enumerate(instruments):
+        ts,i_steps,gt_pots,gt_inst = steps[ii]
+        show_corrected_steps(slopes[ii],zeros[ii],gt_pots,gt_inst,
+                             ts_pots,ts,i_pots,i_steps,
+                             inst['steps_file'].split('.')[0],
+                             plot_format=plot_format)
+
+    if show_plots: get_pyplot().show()
+
+    return slopes,zeros
+
+def correct_times(t_inst,inst,slope,zero):
+    '''
+    Get the corrected times (s) of an instrument
+
+    Args:
+    t_inst: np.array of floats, times in the instrument clock and units
+    inst: dictionary, instrument as given by instrument()
+    slope: float, slope of the time correction
+    zero: float, shift of the time correction
+
+    Return:
+    tt: np.array of floats, times in the potentiostat clock (s)
+    '''
+    tt = (inst['time_unit']*t_inst - zero)/slope
+
+    return tt
@@ -0,0 +1,108 @@
+"""
+.. moduleauthor:: Violeta Gonzalez-Perez <violetagp@protonmail.com>
+"""
+import numpy as np
+
+def cycle_starts(cycle):
+    '''
+    Find where each cycle starts, assuming that the samples
+    of a given cycle are consecutive
+
+    Args:
+    cycle: np.array of integers, cycle number of each sample
+
+    Return:
+    starts: np.array of integers, index of the first sample of each cycle
+    '''
+    starts = np.concatenate(([0],np.flatnonzero(np.diff(cycle)) + 1))
+
+    return starts
+
+def cycle_integrals(tt,current,icp,cycle):
+    '''
+    Integrate (trapezoidal rule) the current and the ICP signals
+    within each cycle. Intervals joining two cycles are not considered,
+    nor samples with cycle number 0 (e.g. within gaps between cycles).
+
+    Args:
+    tt: np.array of floats, times (s)
+    current: np.array of floats, current
+    icp: np.array of floats, 1D (n) or 2D (ncols,n) ICP signals
+    cycle: np.array of integers, cycle number of each sample (0 for none)
+
+    Return:
+    cycles: np.array of integers, cycle numbers
+    t1: np.array of floats, first time of each cycle
+    t2: np.array of floats, last time of each cycle
+    charge: np.array of floats, net charge per cycle (current*s)
+    charge_ox: np.array of floats, anodic (I>0) charge per cycle
+    icp_int: np.array of floats, (ncols,ncycles) integrated ICP (counts*s)
+    '''
+    starts = cycle_starts(cycle)
+    ends = np.append(starts[1:],len(tt)) - 1
+
+    # Time steps, set to 0 where two cycles join
+    dt = np.diff(tt)
+    dt[cycle[1:] != cycle[:-1]] = 0.
+
+    # Charge from each interval
+    dq = np.zeros(len(tt))
+    dq[:-1] = current[1:]
+    dq[:-1] += current[:-1]
+    dq[:-1] *= 0.5*dt
+    charge = np.add.reduceat(dq,starts)
+    charge_ox = np.add.reduceat(np.maximum(dq,0.),starts)
+
+    # Integrated ICP signals from each interval
+    icp2 = np.atleast_2d(icp)
+    dicp = np.zeros(icp2.shape)
+    dicp[:,:-1] = icp2[:,1:]
+    dicp[:,:-1] += icp2[:,:-1]
+    dicp[:,:-1] *= 0.5*dt
+    icp_int = np.add.reduceat(dicp,starts,axis=1)
+
+    # Remove the segments without a cycle
+    ind = np.where(cycle[starts] != 0)[0]
+
+    return cycle[starts][ind],tt[starts][ind],tt[ends][ind],\
+        charge[ind],charge_ox[ind],icp_int[:,ind]
+
+def write_dissolution(outfil,tt,current,icp,cycle,icp_colnoms):
+    '''
+    Write a file with the charge and integrated ICP signals per cycle,
+    together with the cumulative charge and the ratio between the
+    integrated ICP signals and the anodic charge
+
+    Args:
+    outfil: string, name of the output file (with path)
+    tt: np.array of floats, times (s)
+    current: np.array of floats, current (mA)
+    icp: np.array of floats, 1D (n) or 2D (ncols,n) ICP signals
+    cycle: np.array of integers, cycle number of each sample
+    icp_colnoms: list of strings, names of the ICP columns
+    '''
+    cycles,t1,t2,charge,charge_ox,icp_int = cycle_integrals(tt,current,
+                                                            icp,cycle)
+    charge_cum = np.cumsum(charge)
+
+    # Ratio, not defined for cycles without anodic charge
+    ratio = np.full(icp_int.shape,np.nan)
+    np.divide(icp_int,charge_ox,out=ratio,where=(charge_ox > 0.))
+
+    icp_int_head = ", ".join([nom+'_int' for nom in icp_colnoms])
+    ratio_head = ", ".join([nom+'/Q_ox' for nom in icp_colnoms])
+    with open(outfil, 'w') as outf:
+        outf.write('# dissolution per cycle \n')
+        outf.write('# cycle, t_start, t_end, Q, Q_ox, Q_cum, '+\
+                   icp_int_head+', '+ratio_head+' \n')
+        nicp = icp_int.shape[0]
+        outf.write('# , s, s, mC, mC, mC, '+\
+                   ', '.join(['counts s']*nicp)+', '+\
+                   ', '.join(['counts s mC-1']*nicp)+' \n')
+        tofile = np.column_stack((cycles,t1,t2,charge,charge_ox,charge_cum,
+                                  icp_int.T,ratio.T))
+        np.savetxt(outf,tofile,fmt=['%i']+['%1.8e']*(tofile.shape[1]-1),
+                   delimiter=',')
+    print('Output file: {}'.format(outfil))
+
+    return
@@ -4,8 +4,7 @@
 import numpy as np
 import os.path
 from .io import jumpheader
-from .plotting import show_corrected_steps
-import matplotlib.pyplot as plt
+from .plotting import get_pyplot, show_corrected_steps, tune_corrected_steps
 
 def get_start_step_pots(ts_icp,ts_pots,i_pots,tstart_pots,dt_pots):
     '''
@@ -18,42 +17,68 @@ def get_start_step_pots(ts_icp,ts_pots,i_pots,tstart_pots,dt_pots):
 
     return gt_pots,gi_pots
 
-def read_pots_steps(steps_pots,stepcol_pots):
+def instrument(name,data_file,steps_file,columns,step_col,time_col=0,time_unit=1.,delimiter=None,height_fraction=3.,unit='counts'):
     '''
-    Read the potential step times and absolute currents
+    Register an instrument, with its own clock,
+    to be aligned with the potentiostat
+
+    Args:
+    name: string, name of the instrument
+    data_file: string, file with the measurements (in inputdata)
+    steps_file: string, file with the steps used for the time correction (in inputdata)
+    columns: list of integers, columns with the measurements in data_file
+    step_col: integer, column with the steps in steps_file
+    time_col: integer, column with the times in both files
+    time_unit: float, seconds per unit of time (e.g. 60. for minutes)
+    delimiter: string, delimiter of both files (None for spaces)
+    height_fraction: float, used to find the start of the steps
+    unit: string, units of the measurements, for the output header
+
+    Return:
+    inst: dictionary with the properties of the instrument
     '''
-    # Check that the calibration file exists in the inputdata folder
-    ff = 'inputdata/'+steps_pots
-    if not os.path.isfile(ff):
-        print('STOP: file not found, \n {}'.format(ff)) ; exit()
-    
-    ih = jumpheader('inputdata/'+steps_pots)
-    ts_pots, i_pots = np.loadtxt('inputdata/'+steps_pots,
-                       usecols= (0,stepcol_pots),
-                                 unpack=True, skiprows=ih)
-    i_pots = abs(i_pots) # Absolute current
+    inst = {'name':name, 'data_file':data_file, 'steps_file':steps_file,
+            'columns':list(columns), 'step_col':step_col,
+            'time_col':time_col, 'time_unit':time_unit,
+            'delimiter':delimiter, 'height_fraction':height_fraction,
+            'unit':unit}
 
-    return ts_pots, i_pots
+    return inst
 
-def read_icp_steps(steps_icp,icol_icp):
+def read_steps(steps_file,tcol,icol,time_unit=1.,delimiter=None):
     '''
-    Read the ICP step times (in s) and absolute currents
+    Read the step times (in s) and absolute currents of an instrument
+
+    Arg:
+    steps_file: characters, the name of the steps file
+    tcol: integer, column with the times
+    icol: integer, column with the steps
+    time_unit: float, seconds per unit of time in the file
+    delimiter: characters, delimiter of the file (None for spaces)
     '''
     # Check that the calibration file exists in the inputdata folder
-    ff = 'inputdata/'+steps_icp
+    ff = 'inputdata/'+steps_file
     if not os.path.isfile(ff):
         print('STOP: file not found, \n {}'.format(ff)) ; exit()
 
-    # Read the ICP step times
-    ih = jumpheader('inputdata/'+steps_icp)
-    ts_icp, i_icp = np.loadtxt('inputdata/'+steps_icp, delimiter=',',
-                        usecols= (0,icol_icp),unpack=True, skiprows=ih)
-    ts_icp = ts_icp*60. # in seconds
-    i_icp = abs(i_icp)  # Absolute current
+    ih = jumpheader(ff)
+    ts, i_steps = np.loadtxt(ff, delimiter=delimiter,
+                             usecols= (tcol,icol),unpack=True, skiprows=ih)
+    if (time_unit != 1.):
+        ts = ts*time_unit # in seconds
+    i_steps = abs(i_steps) # Absolute current
 
-    return ts_icp, i_icp
+    return ts, i_steps
 
-def get_start_step_icp(ts_pots,i_pots,ts_icp,i_icp,gt_pots,gi_pots,tstart_pots,dt_pots,height_fraction,prefix,plot_format='pdf'):
+def read_pots_steps(steps_pots,stepcol_pots):
+    '''
+    Read the potential step times and absolute currents
+    '''
+    ts_pots, i_pots = read_steps(steps_pots,0,stepcol_pots)
+
+    return ts_pots, i_pots
+
+def get_start_step_icp(ts_pots,i_pots,ts_icp,i_icp,gt_pots,gi_pots,tstart_pots,dt_pots,height_fraction,prefix,plot_format='pdf',make_plots=True):
     '''
     Create a time array that starts in tstart_pots and
     increases in steps of dt_pots. 
@@ -119,6 +144,10 @@ def get_start_step_icp(ts_pots,i_pots,ts_icp,i_icp,gt_pots,gi_pots,tstart_pots,d
             # Reset the subset arrays
             isubs = np.array([]) ; tsubs = np.array([])
 
+    if not make_plots:
+        return gt_icp,gi_icp
+
+    plt = get_pyplot()
     plt.figure()
     plt.xlabel('time (s)') ; plt.ylabel('Current (arbitrary units)')
     plt.plot(ts_pots,i_pots,'k',label='Potentiostat')
@@ -136,11 +165,48 @@ def get_start_step_icp(ts_pots,i_pots,ts_icp,i_icp,gt_pots,gi_pots,tstart_pots,d
 
     return gt_icp,gi_icp
     
-def icp_t_correction(steps_icp,steps_pots,stepcol_pots,icol_icp,tstart_pots,dt_pots,height_fraction,show_plots=True,plot_format='pdf'):
+def get_instrument_steps(inst,ts_pots,i_pots,tstart_pots,dt_pots,plot_format='pdf',make_plots=True):
     '''
-    Correct the time drift from the ICP measurements, by fitting to
-    a straight line the start of a experiment using pulses (steps):
-    t_icp = slope*t_pots + zero
+    Read the steps of an instrument and find where they start
+
+    Args:
+    inst: dictionary, instrument as given by instrument()
+    ts_pots, i_pots: np.array of floats, Potentiostat steps
+    tstart_pots: float, start time for Pots. Steps
+    dt_pots: float, interval for Pots. Steps
+    plot_format: characters, format for plots
+    make_plots: boolean, False to not plot the start of the steps
+
+    Return:
+    ts, i_steps: np.array of floats, normalized steps of the instrument
+    gt_pots, gt_inst: np.array of floats, start of the assigned steps
+    '''
+    prefix = inst['steps_file'].split('.')[0]
+    ts, i_steps = read_steps(inst['steps_file'],inst['time_col'],
+                             inst['step_col'],time_unit=inst['time_unit'],
+                             delimiter=inst['delimiter'])
+
+    # Normalize the steps arbitrarily
+    i_steps = (i_steps-min(i_steps))*max(i_pots)/max(i_steps)
+
+    gt_pots,gi_pots = get_start_step_pots(ts,ts_pots,i_pots,
+                                          tstart_pots,dt_pots)
+    gt_inst,gi_inst = get_start_step_icp(ts_pots,i_pots,ts,i_steps,
+                                         gt_pots,gi_pots,
+                                         tstart_pots,dt_pots,
+                                         inst['height_fraction'],
+                                         prefix,plot_format=plot_format,
+                                         make_plots=make_plots)
+
+    # Remove unassigned starting points
+    ind = np.where(gt_inst>-999.)
+
+    return ts,i_steps,gt_pots[ind],gt_inst[ind]
+
+def get_steps(steps_icp,steps_pots,stepcol_pots,icol_icp,tstart_pots,dt_pots,height_fraction,plot_format='pdf',make_plots=True):
+    '''
+    Read the Potentiostat and ICP steps files and find
+    the start of the steps in both
 
     Arg:
     steps_icp: characters, the name of the ICP steps file
@@ -150,54 +216,32 @@ def icp_t_correction(steps_icp,steps_pots,stepcol_pots,icol_icp,tstart_pots,dt_p
     tstart_pots: float, start time for Pots. Steps
     dt_pots: float, interval for Pots. Steps
     height_fraction: float, used in the time correction calculation
-    show_plots: boolean, to show or not the time correction plots
     plot_format: characters, format for plots
+    make_plots: boolean, False to not plot the start of the steps
 
     Return:
-    slope: float, the slope of the best fit
-    zero: float, the shift of the best fit
+    prefix: characters, prefix for plots
+    ts_pots, i_pots: np.array of floats, Potentiostat steps
+    ts_icp, i_icp: np.array of floats, normalized ICP steps
+    gt_pots, gt_icp: np.array of floats, start of the assigned steps
     '''
-
-    # Prefix for plots
+    # The ICP steps, with times in minutes
+    icp = instrument('icp',None,steps_icp,[icol_icp],icol_icp,
+                     time_unit=60.,delimiter=',',
+                     height_fraction=height_fraction)
     prefix = steps_icp.split('.')[0]
 
     # Read the pots calibration
     ts_pots, i_pots= read_pots_steps(steps_pots,stepcol_pots)
 
-    # Read the ICP calibration
-    ts_icp, i_icp = read_icp_steps(steps_icp,icol_icp)
+    ts_icp,i_icp,gt_pots,gt_icp = get_instrument_steps(icp,ts_pots,i_pots,
+                                                       tstart_pots,dt_pots,
+                                                       plot_format=plot_format,
+                                                       make_plots=make_plots)
 
-    # Normalize the ICP arbitrarily
-    i_icp = (i_icp-min(i_icp))*max(i_pots)/max(i_icp)
-    
-    # Generate the start of the pots steps
-    gt_pots,gi_pots = get_start_step_pots(ts_icp,ts_pots,i_pots,
-                                          tstart_pots,dt_pots)
-
-    # Generate the start of the ICP steps
-    gt_icp,gi_icp = get_start_step_icp(ts_pots,i_pots,ts_icp,i_icp,
-                                       gt_pots,gi_pots,
-                                       tstart_pots,dt_pots,
-                                       height_fraction,
-                                       prefix,plot_format=plot_format)
-
-    # Remove unassigned starting points
-    ind=np.where(gt_icp>-999.)
-    
-    # Fit a straight line to time(pots) vs time(ICP)
-    # time(icp) = slope*time(pots) + zero
-    fit, res, dum1, dum2, dum3 = np.polyfit(gt_pots[ind],gt_icp[ind],1,full=True)
-    slope = fit[0] ; zero = fit[1] 
-
-    # Plot the corrected steps
-    show_corrected_steps(slope,zero,gt_pots[ind],gt_icp[ind],ts_pots,ts_icp,i_pots,i_icp,prefix,plot_format='pdf')
-
-    if show_plots: plt.show()
-    
-    return slope,zero
+    return prefix,ts_pots,i_pots,ts_icp,i_icp,gt_pots,gt_icp
 
-
-def icp_t_manual(steps_icp,steps_pots,stepcol_pots,icol_icp,tstart_pots,dt_pots,height_fraction,slope=0.7,zero=0.,show_plots=True,plot_format='pdf'):
+def icp_t_manual(steps_icp,steps_pots,stepcol_pots,icol_icp,tstart_pots,dt_pots,height_fraction,slope=0.7,zero=0.,show_plots=True,plot_format='pdf',make_plots=True):
     '''
     Manually correct the time drift from the ICP measurements, by using a
     defined straight line to fit the start of a experiment using pulses (steps):
@@ -215,26 +259,62 @@ def icp_t_manual(steps_icp,steps_pots,stepcol_pots,icol_icp,tstart_pots,dt_pots,
     zero: float, zero point to be used
     show_plots: boolean, to show or not the time correction plots
     plot_format: characters, format for plots
+    make_plots: boolean, False to not make any plots
 
     Return:
     Shows the correction if shows_plots=True
 
     '''
     
-    prefix = steps_icp.split('.')[0]
-    ts_pots, i_pots= read_pots_steps(steps_pots,stepcol_pots)
-    ts_icp, i_icp = read_icp_steps(steps_icp,icol_icp)
-    i_icp = (i_icp-min(i_icp))*max(i_pots)/max(i_icp)
-    gt_pots,gi_pots = get_start_step_pots(ts_icp,ts_pots,i_pots,
-                                          tstart_pots,dt_pots)
-    gt_icp,gi_icp = get_start_step_icp(ts_pots,i_pots,ts_icp,i_icp,
-                                       gt_pots,gi_pots,
-                                       tstart_pots,dt_pots,
-                                       height_fraction,
-                                       prefix,plot_format=plot_format)
-    ind=np.where(gt_icp>-999.)
-    show_corrected_steps(slope,zero,gt_pots[ind],gt_icp[ind],
+    prefix,ts_pots,i_pots,ts_icp,i_icp,gt_pots,gt_icp = \
+        get_steps(steps_icp,steps_pots,stepcol_pots,icol_icp,
+                  tstart_pots,dt_pots,height_fraction,
+                  plot_format=plot_format,make_plots=make_plots)
+    if not make_plots:
+        return slope,zero
+    show_corrected_steps(slope,zero,gt_pots,gt_icp,
+                         ts_pots,ts_icp,i_pots,i_icp,prefix,plot_format=plot_format)
+    if (show_plots): get_pyplot().show()
+
+    return slope,zero
+
+
+def icp_t_tuner(steps_icp,steps_pots,stepcol_pots,icol_icp,tstart_pots,dt_pots,height_fraction,slope=0.7,zero=0.,plot_format='pdf'):
+    '''
+    Interactively tune the manual correction of the time drift from
+    the ICP measurements: t_icp = slope*t_pots + zero
+    The steps are read and their start found only once (without
+    plotting them), and the slope and zero are then varied with
+    sliders. The final values are used for the time correction plot.
+
+    Arg:
+    steps_icp: characters, the name of the ICP steps file
+    steps_pots: characters, the name of the Potentiostat steps file
+    stepcol_pots: integer, column with current steps
+    icol_icp: integer, column with ICP steps
+    tstart_pots: float, start time for Pots. Steps
+    dt_pots: float, interval for Pots. Steps
+    height_fraction: float, used in the time correction calculation
+    slope: float, initial slope
+    zero: float, initial zero point
+    plot_format: characters, format for plots
+
+    Return:
+    slope: float, the tuned slope
+    zero: float, the tuned zero point
+    '''
+
+    prefix,ts_pots,i_pots,ts_icp,i_icp,gt_pots,gt_icp = \
+        get_steps(steps_icp,steps_pots,stepcol_pots,icol_icp,
+                  tstart_pots,dt_pots,height_fraction,
+                  plot_format=plot_format,make_plots=False)
+
+    # The window is closed to accept the values
+    slope, zero = tune_corrected_steps(slope,zero,gt_pots,gt_icp,
+                                       ts_pots,ts_icp,i_pots,i_icp)
+    print('Tuned time correction: slope={}, zero={}'.format(slope,zero))
+
+    show_corrected_steps(slope,zero,gt_pots,gt_icp,
                          ts_pots,ts_icp,i_pots,i_icp,prefix,plot_format=plot_format)
-    if (show_plots): plt.show()
 
     return slope,zero
@@ -124,7 +124,7 @@ def joinCVfiles(overwrite=True):
     return cvnom
 
 
-def read_columns(infile,columns,delimiter=None):
+def read_columns(infile,columns,delimiter=None,dtype=float):
     '''
     Read the columns in a file
 
@@ -132,15 +132,12 @@ def read_columns(infile,columns,delimiter=None):
     infile: string, name of file (with path)
     columns: integer or list of integers, position of the columns to be read
     delimiter: string, delimiter to be used when reading the file
+    dtype: data type of the returned values
     '''
     
     ih = jumpheader(infile) #; print('ih={}'.format(ih))
-    if delimiter:
-        values = np.loadtxt(infile, usecols= (columns),
-                            unpack=True, skiprows=ih, delimiter=',')
-    else:
-        values = np.loadtxt(infile, usecols= (columns),
-                            unpack=True, skiprows=ih)
+    values = np.loadtxt(infile, usecols= (columns), dtype=dtype,
+                        unpack=True, skiprows=ih, delimiter=delimiter)
 
     return values
 
@@ -216,3 +213,120 @@ def get_Dt(files):
             Dt[ii] = tsec - t0pre
 
     return Dt
+
+
+def output_dtype(names,compact=False):
+    '''
+    Get the data type of an output table, with the first column
+    (time) always in double precision
+
+    Parameters:
+    names : list of strings
+       Names of the columns
+    compact : boolean
+       True to store all but the first column in single precision
+
+    Return:
+    dtype : numpy dtype
+       Structured data type for the output table
+    '''
+
+    signal = np.float32 if compact else np.float64
+    dtype = np.dtype([(names[0],np.float64)] +
+                     [(nom,signal) for nom in names[1:]])
+
+    return dtype
+
+
+def output_fmt(dtype):
+    '''
+    Get the format to write each column of an output table,
+    with fewer digits for single precision columns
+
+    Parameters:
+    dtype : numpy dtype
+       Structured data type of the output table
+
+    Return:
+    fmt : list of strings
+       Format for each column
+    '''
+
+    fmt = ['%1.6e' if dtype[nom] == np.float32 else '%1.8e'
+           for nom in dtype.names]
+
+    return fmt
+
+
+def column_view(table,names):
+    '''
+    Get a 2D view of consecutive columns of an output table,
+    sharing its memory, so that the columns can be filled in place
+
+    Parameters:
+    table : numpy structured array
+       Output table
+    names : list of strings
+       Names of consecutive columns with the same data type
+
+    Return:
+    view : numpy array
+       Array with shape (len(names),len(table))
+    '''
+
+    from numpy.lib.recfunctions import structured_to_unstructured
+
+    view = structured_to_unstructured(table[names],copy=False).T
+    if not np.shares_memory(view,table):
+        print('STOP (src/io) \n columns {} cannot be viewed together'.format(names))
+        exit()
+
+    return view
+
+
+def prefetch_columns(pool,infile,columns,delimiter=None,dtype=float):
+    '''
+    Start reading the columns in a file in the background
+
+    Parameters:
+    pool : concurrent.futures.Executor
+       Pool of threads to read the file with
+    infile : string
+       Name of file (with path)
+    columns : integer or list of integers
+       Position of the columns to be read
+    delimiter : string
+       Delimiter to be used when reading the file
+    dtype : data type
+       Data type of the values
+
+    Return:
+    future : concurrent.futures.Future
+       Its result() gives the values, as returned by read_columns
+    '''
+
+    future = pool.submit(read_columns,infile,columns,
+                         delimiter=delimiter,dtype=dtype)
+
+    return future
+
+
+def write_output(outfil,header,table):
+    '''
+    Write an output table, with the header on top.
+    Nothing is printed, so that it can be run in the background.
+
+    Parameters:
+    outfil : string
+       Name of the output file (with path)
+    header : string
+       Header lines, including line breaks
+    table : numpy structured array
+       Output table
+    '''
+
+    with open(outfil, 'w') as outf:
+        outf.write(header)
+        np.savetxt(outf,table,fmt=output_fmt(table.dtype),delimiter=',')
+
+    return
@@ -2,12 +2,35 @@
 .. moduleauthor:: Violeta Gonzalez-Perez <violetagp@protonmail.com>
 """
 import numpy as np
+import os
 import sys
 from .io import jumpheader
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
+
+def get_pyplot():
+    '''
+    Import matplotlib.pyplot only when a plot is first needed,
+    using a non-interactive backend if there is no display
+    (unless a backend is set with MPLBACKEND)
+
+    Return:
+    plt: the matplotlib.pyplot module
+    '''
+    if 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+        if (sys.platform.startswith('linux') and
+            not os.environ.get('MPLBACKEND') and
+            not os.environ.get('DISPLAY') and
+            not os.environ.get('WAYLAND_DISPLAY')):
+            matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    return plt
+
 
 def show_corrected_steps(slope,zero,gt_pots,gt_icp,ts_pots,ts_icp,i_pots,i_icp,prefix,plot_format='pdf'):
+    plt = get_pyplot()
+    import matplotlib.gridspec as gridspec
+
     # Plot set up
     fig = plt.figure(figsize=(8.,9.))
     gs = gridspec.GridSpec(4,1)
@@ -79,9 +102,147 @@ def show_corrected_steps(slope,zero,gt_pots,gt_icp,ts_pots,ts_icp,i_pots,i_icp,p
     return
 
 
+def decimate(xx,yy,npoints=2000):
+    '''
+    Reduce the number of points to be plotted, keeping the minimum
+    and maximum within each of npoints/2 bins, so that peaks are kept
+
+    Arg:
+    xx: np.array of floats, x values
+    yy: np.array of floats, y values
+    npoints: integer, maximum number of points to keep
+
+    Return:
+    xd: np.array of floats, decimated x values
+    yd: np.array of floats, decimated y values
+    '''
+    if (len(xx) <= npoints):
+        return xx, yy
+
+    starts = np.linspace(0,len(xx),npoints//2,endpoint=False).astype(int)
+    xd = np.repeat(xx[starts],2)
+    yd = np.empty(len(xd))
+    yd[0::2] = np.minimum.reduceat(yy,starts)
+    yd[1::2] = np.maximum.reduceat(yy,starts)
+
+    return xd, yd
+
+
+def tune_corrected_steps(slope,zero,gt_pots,gt_icp,ts_pots,ts_icp,i_pots,i_icp,npoints=2000):
+    '''
+    Figure with sliders to tune the time correction,
+    t_icp = slope*t_pots + zero. Only the corrected ICP steps and the
+    residuals are redrawn when the sliders move (blitting),
+    using decimated steps. Only this figure is waited for,
+    and an interactive backend is required.
+
+    Return:
+    slope: float, slope when the figure is closed
+    zero: float, zero point when the figure is closed
+    '''
+    plt = get_pyplot()
+    import matplotlib.gridspec as gridspec
+    from matplotlib.widgets import Slider
+
+    # Plot set up
+    fig = plt.figure(figsize=(8.,7.))
+    if fig.canvas.required_interactive_framework is None:
+        plt.close(fig)
+        print('STOP (src/plotting) \n the time correction cannot be tuned with the non-interactive backend {}; use a display (or set MPLBACKEND) or tune_time_manually=False'.format(plt.get_backend()))
+        exit()
+    gs = gridspec.GridSpec(2,1,height_ratios=[3,1])
+    gs.update(wspace=0., hspace=0., bottom=0.25)
+    xmin = min(ts_pots) ; xmax = max(ts_pots)
+
+    # i vs t
+    xp,yp = decimate(ts_pots,i_pots,npoints)
+    xi,yi = decimate(ts_icp,i_icp,npoints)
+
+    axs = fig.add_subplot(gs[0])
+    axs.set_ylabel('Current (arbitrary units)')
+    axs.set_xlim(xmin,xmax) ; axs.set_autoscale_on(False)
+    axs.set_ylim(min(min(yp),min(yi)),1.05*max(max(yp),max(yi)))
+    plt.setp(axs.get_xticklabels(),visible=False)
+
+    axs.plot(xp,yp,'k',label='Potentiostat')
+    line_icp, = axs.plot((xi-zero)/slope,yi,'r',
+                         label='ICP corrected',animated=True)
+    leg = axs.legend(loc=0) ; leg.draw_frame(False)
+
+    # Residuals vs t
+    def residuals(slope,zero):
+        return gt_icp - (slope*gt_pots + zero)
+
+    res = residuals(slope,zero)
+    dres = max(np.max(np.abs(res)),1.)
+
+    axr = fig.add_subplot(gs[1],sharex=axs)
+    axr.set_xlabel('t_pots (s)') ; axr.set_ylabel('t_icp - fit (s)')
+    axr.set_autoscale_on(False) ; axr.set_ylim(-1.5*dres,1.5*dres)
+    axr.axhline(0.,color='k',linestyle=':')
+    line_res, = axr.plot(gt_pots,res,'b.',animated=True)
+
+    # Sliders
+    dzero = 0.1*(xmax-xmin)
+    s_slope = Slider(fig.add_axes([0.15,0.1,0.7,0.03]),'slope',
+                     0.5*slope,1.5*slope,valinit=slope)
+    s_zero = Slider(fig.add_axes([0.15,0.05,0.7,0.03]),'zero',
+                    zero-dzero,zero+dzero,valinit=zero)
+
+    # The sliders are redrawn together with the animated lines
+    s_slope.drawon = False ; s_zero.drawon = False
+    background = [None]
+
+    def draw_animated():
+        axs.draw_artist(line_icp)
+        axr.draw_artist(line_res)
+        fig.draw_artist(s_slope.ax)
+        fig.draw_artist(s_zero.ax)
+
+    def on_draw(event):
+        background[0] = fig.canvas.copy_from_bbox(fig.bbox)
+        draw_animated()
+
+    def update(val):
+        slope = s_slope.val ; zero = s_zero.val
+        if (slope == 0.): return
+
+        line_icp.set_xdata((xi-zero)/slope)
+        res = residuals(slope,zero)
+        line_res.set_ydata(res)
+
+        ymin,ymax = axr.get_ylim()
+        if (background[0] is None or min(res) < ymin or max(res) > ymax):
+            # Full redraw, only when the residuals leave the panel
+            dres = max(np.max(np.abs(res)),1.)
+            axr.set_ylim(-1.5*dres,1.5*dres)
+            fig.canvas.draw_idle()
+            return
+
+        fig.canvas.restore_region(background[0])
+        draw_animated()
+        fig.canvas.blit(fig.bbox)
+
+    fig.canvas.mpl_connect('draw_event',on_draw)
+    s_slope.on_changed(update)
+    s_zero.on_changed(update)
+
+    # Wait until the figure is closed
+    fig.canvas.mpl_connect('close_event',
+                           lambda event: fig.canvas.stop_event_loop())
+    fig.show()
+    fig.canvas.start_event_loop(timeout=0)
+
+    return s_slope.val, s_zero.val
+
+
 def show_pots_icp(xx,y_pots,iny_icp,tini,prop_label,prefix,
                   plot_format='pdf',icplabels=None):
-    
+    '''
+    Plot the potentiostat and ICP signals
+    '''
+    plt = get_pyplot()
+
     # Plot set up
     fig, ax1 = plt.subplots()
     
@@ -0,0 +1,120 @@
+"""
+.. moduleauthor:: Violeta Gonzalez-Perez <violetagp@protonmail.com>
+"""
+import numpy as np
+
+def uniform_grid(t1,t2,dt):
+    '''
+    Create a uniform time grid from t1 to t2 (both included, if
+    t2-t1 is a multiple of dt) in steps of dt
+
+    Args:
+    t1: float, first time of the grid
+    t2: float, last time to be covered by the grid
+    dt: float, step of the grid
+
+    Return:
+    grid: np.array of floats, uniform time grid
+    '''
+    if (dt <= 0.):
+        print('STOP (src/resample) \n dt={} should be positive'.format(dt))
+        exit()
+
+    nn = int(np.floor((t2-t1)/dt + 1e-9)) + 1
+    grid = t1 + dt*np.arange(nn)
+
+    return grid
+
+def interp_columns(xnew,xx,yy,out=None):
+    '''
+    Linear interpolation of all the rows of yy at once.
+    As np.interp, values outside the xx range take
+    the value of the closest edge.
+
+    Args:
+    xnew: np.array of floats, times to interpolate to
+    xx: np.array of floats, increasing times of the samples
+    yy: np.array of floats, 1D (n) or 2D (ncols,n) sampled values
+    out: np.array of floats, optional array (or view) to write the result to
+
+    Return:
+    ynew: np.array of floats, 1D (len(xnew)) or 2D (ncols,len(xnew))
+    '''
+    xnew = np.asarray(xnew)
+    if out is None:
+        out = np.empty(np.shape(yy)[:-1]+(len(xnew),),dtype=float)
+    if (len(xx) == 1):
+        out[...] = yy[...,:1]
+        return out
+
+    # Indexes and weights shared by all the columns
+    jj = np.clip(np.searchsorted(xx,xnew,side='right'),1,len(xx)-1)
+    x0 = xx[jj-1] ; x1 = xx[jj]
+
+    # For repeated times, take the value at x1 as np.interp
+    ww = np.where(xnew < x0,0.,1.)
+    np.divide(xnew - x0,x1 - x0,out=ww,where=(x1 > x0))
+    np.clip(ww,0.,1.,out=ww)
+
+    y0 = yy[...,jj-1]
+    np.subtract(yy[...,jj],y0,out=out)
+    out *= ww
+    out += y0
+
+    return out
+
+def resample_columns(grid,xx,yy,average=True,out=None):
+    '''
+    Resample the rows of yy onto a uniform time grid, in one pass.
+    If average=True, the samples falling within each grid bin,
+    [grid-dt/2,grid+dt/2], are averaged, smoothing the signal
+    when downsampling. Samples on the edge between two bins count
+    half in each of them. Bins with less than two samples or not fully
+    covered by the samples are interpolated.
+
+    Args:
+    grid: np.array of floats, uniform time grid
+    xx: np.array of floats, increasing times of the samples
+    yy: np.array of floats, 1D (n) or 2D (ncols,n) sampled values
+    average: boolean, True to average samples within each bin
+    out: np.array of floats, optional array (or view) to write the result to
+
+    Return:
+    ynew: np.array of floats, 1D (len(grid)) or 2D (ncols,len(grid))
+    '''
+    ynew = interp_columns(grid,xx,yy,out=out)
+    if (not average or len(grid) < 2):
+        return ynew
+
+    ng = len(grid)
+    dt = grid[1] - grid[0]
+
+    # Bin index of each sample, with those on an edge
+    # between two bins also added, with half weight, to the previous bin
+    pos = (xx - grid[0])/dt + 0.5
+    edge = np.abs(pos - np.round(pos)) < 1e-6
+    ibin = np.where(edge,np.round(pos),np.floor(pos)).astype(int)
+    isample = np.concatenate((np.arange(len(xx)),np.flatnonzero(edge)))
+    ibin = np.concatenate((ibin,ibin[edge]-1))
+    wsample = np.concatenate((np.where(edge,0.5,1.),
+                              np.full(np.count_nonzero(edge),0.5)))
+    ind = np.where((ibin >= 0) & (ibin < ng))[0]
+    isample = isample[ind] ; ibin = ibin[ind] ; wsample = wsample[ind]
+
+    # Average only bins with more than one sample and within the data
+    weights = np.bincount(ibin,weights=wsample,minlength=ng)
+    tol = 1e-6*dt
+    full = (weights > 1.) & (grid - 0.5*dt >= xx[0] - tol) & \
+           (grid + 0.5*dt <= xx[-1] + tol)
+
+    # Weighted sums per bin for all columns, using an offset for each column
+    y2d = np.atleast_2d(yy)[:,isample]
+    ncols = y2d.shape[0]
+    offsets = ng*np.arange(ncols)[:,None]
+    sums = np.bincount((ibin[None,:] + offsets).ravel(),
+                       weights=(y2d*wsample).ravel(),
+                       minlength=ncols*ng).reshape(ncols,ng)
+
+    np.atleast_2d(ynew)[:,full] = sums[:,full]/weights[full]
+
+    return ynew
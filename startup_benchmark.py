@@ -0,0 +1,68 @@
+"""A python module to check the start up time of cv_icp.py.
+
+.. moduleauthor:: Violeta Gonzalez-Perez <violetagp@protonmail.com>
+
+The modules used by cv_icp.py are imported in fresh python processes,
+nrep times, comparing the median import time with that of numpy alone.
+The program stops with an error if matplotlib is imported at start up
+or if the import time added to numpy's is above max_overhead.
+"""
+#############Input to be modified#############
+
+nrep = 5 # Number of fresh python processes
+max_overhead = 0.1 # Maximum time (s) added to the import of numpy
+#####################################End of modifications
+
+import subprocess
+import sys
+import os.path
+
+reference = 'import numpy'
+modules = '''import numpy
+import concurrent.futures
+import src.io, src.indexes, src.resample, src.dissolution
+import src.plotting, src.icp_t_correction, src.alignment'''
+
+timer = '''
+import sys, time
+t0 = time.perf_counter()
+{}
+t1 = time.perf_counter()
+print(t1-t0, 'matplotlib' in sys.modules)
+'''
+
+def time_imports(code,nrep):
+    '''
+    Time some imports in fresh python processes
+
+    Args:
+    code: string, lines with the imports
+    nrep: integer, number of processes
+
+    Return:
+    tmedian: float, median time (s)
+    mpl: boolean, True if matplotlib was imported
+    '''
+    times = [] ; mpl = False
+    for ii in range(nrep):
+        out = subprocess.run([sys.executable,'-c',timer.format(code)],
+                             cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True,text=True,check=True)
+        tt, imported = out.stdout.split()
+        times.append(float(tt))
+        mpl = mpl or (imported == 'True')
+
+    times.sort()
+    tmedian = times[len(times)//2]
+
+    return tmedian, mpl
+
+t_ref, dum = time_imports(reference,nrep)
+t_all, mpl = time_imports(modules,nrep)
+print('Import time: {:.3f} s (numpy alone: {:.3f} s)'.format(t_all,t_ref))
+
+if mpl:
+    print('STOP: matplotlib is imported at start up') ; sys.exit(1)
+if (t_all - t_ref > max_overhead):
+    print('STOP: start up takes {:.3f} s more than numpy alone (max. {} s)'.format(t_all-t_ref,max_overhead))
+    sys.exit(1)